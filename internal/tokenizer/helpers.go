@@ -11,6 +11,7 @@ import (
 const (
 	anthropicScriptName = "anthropic_count.py"
 	llamaScriptName     = "llama_count.py"
+	runtimeModuleName   = "helper_runtime.py"
 )
 
 //go:embed helpers/*.py
@@ -26,7 +27,7 @@ func materializeHelperScripts(targetDir string) (string, error) {
 		return "", fmt.Errorf("create helper dir: %w", createErr)
 	}
 
-	entries := []string{anthropicScriptName, llamaScriptName}
+	entries := []string{anthropicScriptName, llamaScriptName, runtimeModuleName}
 	for _, scriptName := range entries {
 		content, readErr := fs.ReadFile(embeddedHelperScripts, filepath.Join("helpers", scriptName))
 		if readErr != nil {
@@ -1,4 +1,4 @@
-#!/usr/bin/env -S uv run -qq
+#!/usr/bin/env -S uv run -qq --compile-bytecode
 # /// script
 # requires-python = ">=3.11"
 # dependencies = [
@@ -6,25 +6,75 @@
 # ]
 # ///
 
-import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
 import os
+from pathlib import Path
 import sys
-from typing import List
+import time
+from typing import Callable, List, Optional
+
+import helper_runtime
+
+BATCH_SEPARATOR = b"\0"
+BATCH_WORKERS = 8
+DEFAULT_MODEL = "claude-3-5-sonnet-20241022"
+MODELS_CACHE_FILE = "anthropic-models.json"
+MODELS_CACHE_TTL_SECONDS = 24 * 60 * 60
+USAGE = f"""usage: anthropic_count.py [-h] [--model MODEL] [--system SYSTEM] [--daemon] [--batch]
+
+Count tokens for Anthropic Claude models.
+
+options:
+  -h, --help       show this help message and exit
+  --model MODEL    Anthropic model name (default: {DEFAULT_MODEL}).
+  --system SYSTEM  Optional system prompt to include in counting.
+  --daemon         Count through a background process that reuses one API client between calls (Unix only).
+  --batch          Read NUL-separated prompts from stdin and print one count per line.
+"""
+
 
 def main() -> None:
-    argument_parser = argparse.ArgumentParser(description="Count tokens for Anthropic Claude models.")
-    argument_parser.add_argument(
-        "--model",
-        default="claude-3-5-sonnet-20241022",
-        help="Anthropic model name (default: claude-3-5-sonnet-20241022).",
+    parsed_args = helper_runtime.parse_arguments(
+        USAGE,
+        {"model": DEFAULT_MODEL, "system": None},
+        ("daemon", "batch"),
     )
-    argument_parser.add_argument(
-        "--system",
-        default=None,
-        help="Optional system prompt to include in counting.",
-    )
-    parsed_args = argument_parser.parse_args()
+    if parsed_args["batch"] and parsed_args["daemon"]:
+        helper_runtime.usage_error(USAGE, "--batch cannot be combined with --daemon")
+
+    api_key = os.getenv("ANTHROPIC_API_KEY")
+    if not api_key:
+        sys.stderr.write("ANTHROPIC_API_KEY is not set in the environment.\n")
+        sys.exit(1)
+
+    user_payload = helper_runtime.read_stdin_bytes()
+    if not user_payload:
+        helper_runtime.write_counts([0])
+        return
+
+    def build_counter() -> Callable[[bytes], int]:
+        return build_api_counter(api_key, parsed_args["model"], parsed_args["system"])
 
+    try:
+        if parsed_args["batch"]:
+            token_counts = count_batch(build_counter(), split_prompts(user_payload))
+        elif parsed_args["daemon"] and helper_runtime.DAEMON_SUPPORTED:
+            variant = "\0".join([api_key, parsed_args["model"], parsed_args["system"] or ""])
+            socket_path = helper_runtime.socket_path("anthropic", Path(__file__), variant)
+            token_counts = [helper_runtime.count_via_daemon(socket_path, user_payload, build_counter)]
+        else:
+            token_counts = [build_counter()(user_payload)]
+    except helper_runtime.CountError as count_error:
+        sys.stderr.write(f"{count_error}\n")
+        sys.exit(1)
+
+    # Print only the integers, one per line
+    helper_runtime.write_counts(token_counts)
+
+
+def build_api_counter(api_key: str, model: str, system_prompt: Optional[str]) -> Callable[[bytes], int]:
+    """Create one Anthropic client and return a counter that reuses it."""
     try:
         from anthropic import Anthropic  # type: ignore
     except Exception as import_error:
@@ -32,32 +82,41 @@ def main() -> None:
         sys.stderr.write("Install with: uv pip install anthropic\n")
         sys.exit(1)
 
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
-        sys.stderr.write("ANTHROPIC_API_KEY is not set in the environment.\n")
-        sys.exit(1)
-
     client = Anthropic(api_key=api_key)
 
-    user_text = sys.stdin.read()
+    def count(user_payload: bytes) -> int:
+        if not user_payload:
+            return 0
+        request_args = {
+            "model": model,
+            "messages": build_user_messages(str(user_payload, "utf-8")),
+        }
+        if system_prompt:
+            request_args["system"] = system_prompt
+
+        try:
+            token_count = client.messages.count_tokens(**request_args)
+        except Exception as count_error:
+            raise helper_runtime.CountError(
+                describe_count_error(client, model, count_error)
+            ) from count_error
+        return token_count.input_tokens
 
-    messages_payload = build_user_messages(user_text)
-    system_prompt = parsed_args.system
+    return count
 
-    request_args = {
-        "model": parsed_args.model,
-        "messages": messages_payload,
-    }
-    if system_prompt:
-        request_args["system"] = system_prompt
 
-    try:
-        token_count = client.messages.count_tokens(**request_args)
-    except Exception as count_error:
-        handle_count_error(client, parsed_args.model, count_error)
+def split_prompts(payload: helper_runtime.StdinPayload) -> List[bytes]:
+    """Split NUL-separated prompts, tolerating one trailing separator."""
+    prompts = bytes(payload).split(BATCH_SEPARATOR)
+    if len(prompts) > 1 and not prompts[-1]:
+        prompts.pop()
+    return prompts
+
 
-    # Print only the integer with a newline
-    sys.stdout.write(f"{token_count.input_tokens}\n")
+def count_batch(counter: Callable[[bytes], int], prompts: List[bytes]) -> List[int]:
+    """Count prompts concurrently over one client so they share its connection pool."""
+    with ThreadPoolExecutor(max_workers=max(1, min(len(prompts), BATCH_WORKERS))) as executor:
+        return list(executor.map(counter, prompts))
 
 
 def build_user_messages(user_text: str) -> List[dict]:
@@ -75,38 +134,33 @@ def build_user_messages(user_text: str) -> List[dict]:
     ]
 
 
-def handle_count_error(client, requested_model: str, count_error: Exception) -> None:
-    """Emit a helpful error and exit, adding model suggestions when available."""
+def describe_count_error(client, requested_model: str, count_error: Exception) -> str:
+    """Build a helpful error message, adding model suggestions when available."""
     try:
-        from anthropic import APIStatusError, NotFoundError  # type: ignore
+        from anthropic import NotFoundError  # type: ignore
     except Exception:  # anthropic < 0.18 compatibility
-        APIStatusError = NotFoundError = tuple()  # type: ignore
+        NotFoundError = tuple()  # type: ignore
 
     if isinstance(count_error, NotFoundError):  # pragma: no cover - network dependent
+        message = f"Model {requested_model!r} was not found by the Anthropic API."
         suggestions = discover_claude_models(client)
-        sys.stderr.write(
-            f"Model {requested_model!r} was not found by the Anthropic API.\n"
-        )
         if suggestions:
-            sys.stderr.write(
-                "Available Claude models: " + ", ".join(suggestions) + "\n"
-            )
-        sys.exit(1)
+            message += "\nAvailable Claude models: " + ", ".join(suggestions)
+        return message
 
-    if APIStatusError and isinstance(count_error, APIStatusError):  # pragma: no cover
-        sys.stderr.write(
-            f"Failed to count tokens via Anthropic API: {count_error}\n"
-        )
-        sys.exit(1)
-
-    sys.stderr.write(
-        f"Failed to count tokens via Anthropic API: {count_error}\n"
-    )
-    sys.exit(1)
+    return f"Failed to count tokens via Anthropic API: {count_error}"
 
 
 def discover_claude_models(client) -> List[str]:
-    """Return a short, sorted list of Claude models for better guidance."""
+    """Return a short, sorted list of Claude models for better guidance.
+
+    A non-empty list is cached for a day so repeated not-found errors skip
+    the models.list() round-trip.
+    """
+    cached_names = read_cached_models()
+    if cached_names is not None:
+        return cached_names
+
     try:
         models = client.models.list()
     except Exception:  # pragma: no cover - network dependent
@@ -119,7 +173,36 @@ def discover_claude_models(client) -> List[str]:
             names.append(model_id)
 
     names.sort()
+    if names:
+        write_cached_models(names[:10])
     return names[:10]
 
+
+def read_cached_models() -> Optional[List[str]]:
+    """Return the cached model names if the cache is fresh and non-empty, else None."""
+    cache_path = helper_runtime.cache_dir() / MODELS_CACHE_FILE
+    try:
+        if time.time() - cache_path.stat().st_mtime >= MODELS_CACHE_TTL_SECONDS:
+            return None
+        names = json.loads(cache_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if names and isinstance(names, list) and all(isinstance(name, str) for name in names):
+        return names
+    return None
+
+
+def write_cached_models(names: List[str]) -> None:
+    """Atomically replace the model cache, ignoring filesystem errors."""
+    cache_path = helper_runtime.cache_dir() / MODELS_CACHE_FILE
+    staging_path = cache_path.with_name(f"{MODELS_CACHE_FILE}.{os.getpid()}")
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        staging_path.write_text(json.dumps(names), encoding="utf-8")
+        os.replace(staging_path, cache_path)
+    except OSError:  # pragma: no cover - the cache is only an optimization
+        return
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,406 @@
+"""Runtime shared by the ctx tokenizer helpers.
+
+Holds the argument and stdin plumbing both helpers use and the optional
+Unix-socket daemon:
+with ``--daemon`` a helper forwards stdin to a long-lived server that keeps the
+tokenizer loaded, so repeated invocations skip the heavy imports and model
+setup. The first invocation forks the server; it exits after sitting idle.
+The daemon needs fork and Unix sockets, so where DAEMON_SUPPORTED is false
+the helpers ignore ``--daemon`` and count directly.
+"""
+
+import functools
+import hashlib
+import mmap
+import os
+import select
+import socket
+import stat
+import struct
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, NoReturn, Optional, Sequence, Union
+
+STDIN_READ_BYTES = 1 << 20
+IDLE_TIMEOUT_SECONDS = 300
+FRAME_HEADER = struct.Struct("!Q")
+STATUS_OK = b"\x00"
+STATUS_ERROR = b"\x01"
+READY_MARKER = b"ready"
+DAEMON_SUPPORTED = hasattr(socket, "AF_UNIX") and all(
+    hasattr(os, name) for name in ("fork", "setsid", "getuid")
+)
+
+Counter = Callable[[bytes], int]
+StdinPayload = Union[bytearray, mmap.mmap]
+
+
+class CountError(Exception):
+    """A counting failure whose message is meant for the end user."""
+
+
+@functools.cache
+def cache_dir() -> Path:
+    """Return the ctx cache directory, honouring XDG_CACHE_HOME.
+
+    Resolved on first use rather than at import, so runs that never touch
+    the cache skip the home-directory lookup.
+    """
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "ctx"
+
+
+def parse_arguments(
+    usage: str,
+    value_defaults: Dict[str, Optional[str]],
+    switches: Sequence[str],
+) -> Dict[str, Any]:
+    """Parse ``--name value``, ``--name=value`` and boolean ``--switch`` flags.
+
+    A hand-rolled stand-in for argparse, whose import and parser setup take
+    longer than counting a small file. Keys are the flag names without dashes.
+    """
+    parsed: Dict[str, Any] = dict(value_defaults)
+    parsed.update({switch: False for switch in switches})
+    arguments = sys.argv[1:]
+    index = 0
+    while index < len(arguments):
+        argument = arguments[index]
+        index += 1
+        if argument in ("-h", "--help"):
+            sys.stdout.write(usage)
+            sys.exit(0)
+        if not argument.startswith("--"):
+            usage_error(usage, f"unrecognized argument: {argument}")
+        name, separator, inline_value = argument[2:].partition("=")
+        if name in switches and not separator:
+            parsed[name] = True
+        elif name in value_defaults and separator:
+            parsed[name] = inline_value
+        elif name in value_defaults and index < len(arguments):
+            parsed[name] = arguments[index]
+            index += 1
+        elif name in value_defaults:
+            usage_error(usage, f"argument --{name}: expected one argument")
+        else:
+            usage_error(usage, f"unrecognized argument: {argument}")
+    return parsed
+
+
+def usage_error(usage: str, message: str) -> NoReturn:
+    """Print the usage line and message to stderr and exit 2, as argparse does."""
+    usage_line = usage.partition("\n")[0]
+    sys.stderr.write(f"{usage_line}\nerror: {message}\n")
+    sys.exit(2)
+
+
+def map_stdin() -> Optional[mmap.mmap]:
+    """Map stdin read-only when it is a regular file redirected from the start.
+
+    ``helper < file`` then hands the page cache to the caller instead of
+    copying the whole input into a bytearray; pipes, empty files, and
+    partially consumed descriptors return None.
+    """
+    stdin_stat = os.fstat(0)
+    if not stat.S_ISREG(stdin_stat.st_mode) or stdin_stat.st_size == 0:
+        return None
+    try:
+        if os.lseek(0, 0, os.SEEK_CUR) != 0:
+            return None
+        return mmap.mmap(0, 0, access=mmap.ACCESS_READ)
+    except OSError:
+        return None
+
+
+def read_stdin_bytes() -> StdinPayload:
+    """Read all of stdin, mapping regular files and reading pipes in 1 MiB chunks."""
+    mapped = map_stdin()
+    if mapped is not None:
+        return mapped
+    payload = bytearray()
+    while True:
+        chunk = os.read(0, STDIN_READ_BYTES)
+        if not chunk:
+            return payload
+        payload += chunk
+
+
+def iter_stdin_blocks() -> Iterator[bytes]:
+    """Yield stdin in line-aligned blocks cut by the iter_line_blocks rule.
+
+    Reads accumulate until a block is complete, since a pipe returns at most
+    its capacity (64 KiB on Linux) per read. Only bytes not searched before
+    are scanned for a newline, keeping newline-free input linear. Memory
+    stays bounded by the block size plus the longest line.
+    """
+    buffer = bytearray()
+    while chunk := os.read(0, STDIN_READ_BYTES):
+        search_start = max(len(buffer), STDIN_READ_BYTES)
+        buffer += chunk
+        while (newline := buffer.find(b"\n", search_start)) >= 0:
+            yield bytes(buffer[:newline + 1])
+            del buffer[:newline + 1]
+            search_start = STDIN_READ_BYTES
+    if buffer:
+        yield bytes(buffer)
+
+
+def iter_line_blocks(payload: Union[bytes, StdinPayload], block_bytes: int) -> Iterator[bytes]:
+    """Yield payload in pieces ending at the first newline at least block_bytes in.
+
+    The cuts depend only on the content, so splitting a whole payload with
+    STDIN_READ_BYTES gives the same blocks as streaming it through
+    iter_stdin_blocks, however the reads happened to be sized.
+    """
+    view = memoryview(payload)
+    start = 0
+    while start < len(payload):
+        newline = payload.find(b"\n", start + block_bytes)
+        end = len(payload) if newline < 0 else newline + 1
+        yield bytes(view[start:end])
+        start = end
+
+
+def write_counts(token_counts: Iterable[int]) -> None:
+    """Write one count per line straight to fd 1, skipping the text io stack."""
+    output = b"".join(b"%d\n" % token_count for token_count in token_counts)
+    while output:
+        output = output[os.write(1, output):]
+
+
+def socket_path(helper_name: str, script_path: Path, variant: str) -> str:
+    """Return the per-user socket path for one helper configuration.
+
+    The helper source and this module's source are part of the key, so an
+    upgraded ctx never talks to a daemon still running older helper code or
+    an older framing protocol.
+    """
+    digest = hashlib.sha256()
+    digest.update(script_path.read_bytes())
+    digest.update(Path(__file__).read_bytes())
+    digest.update(variant.encode("utf-8"))
+    filename = f"{helper_name}-{digest.hexdigest()[:16]}.sock"
+    return os.path.join(socket_directory(), filename)
+
+
+def socket_directory() -> str:
+    """Return a directory only the current user can reach, creating it if needed.
+
+    Sockets live in $XDG_RUNTIME_DIR when set, otherwise in a 0700 per-user
+    directory under the system temp dir. A pre-existing directory that is a
+    symlink, owned by someone else, or open to other users is refused, so no
+    other local user can plant a socket where the helper will send its input.
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        directory = os.path.join(runtime_dir, "ctx")
+    else:
+        directory = os.path.join(tempfile.gettempdir(), f"ctx-tok-{os.getuid()}")
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    except OSError as mkdir_error:
+        raise CountError(
+            f"cannot create tokenizer daemon directory {directory}: {mkdir_error}"
+        ) from mkdir_error
+
+    directory_stat = os.lstat(directory)
+    if (
+        not stat.S_ISDIR(directory_stat.st_mode)
+        or directory_stat.st_uid != os.getuid()
+        or directory_stat.st_mode & 0o077
+    ):
+        raise CountError(
+            f"refusing tokenizer daemon directory {directory}: not a private directory owned by this user"
+        )
+    return directory
+
+
+def count_via_daemon(path: str, payload: StdinPayload, build_counter: Callable[[], Counter]) -> int:
+    """Send payload to the daemon at path, starting it first when needed.
+
+    A daemon that drops the request, for example one that hit its idle
+    timeout just as we connected or crashed mid-count, is replaced once;
+    a second socket failure becomes a CountError.
+    """
+    try:
+        response = exchange_with_daemon(path, payload, build_counter)
+    except OSError:
+        remove_socket(path)
+        try:
+            response = exchange_with_daemon(path, payload, build_counter)
+        except OSError as socket_error:
+            raise CountError(f"tokenizer daemon on {path} failed: {socket_error}") from socket_error
+
+    status, body = response[:1], response[1:]
+    if status != STATUS_OK:
+        raise CountError(body.decode("utf-8", errors="replace"))
+    return int(body)
+
+
+def exchange_with_daemon(path: str, payload: StdinPayload, build_counter: Callable[[], Counter]) -> bytes:
+    """Send one request frame and return the daemon's response frame."""
+    connection = connect(path)
+    if connection is None:
+        spawn_server(path, build_counter)
+        connection = connect(path)
+        if connection is None:
+            raise CountError(f"tokenizer daemon did not accept connections on {path}")
+
+    with connection:
+        send_frame(connection, payload)
+        response = receive_frame(connection)
+    if response is None:
+        raise ConnectionResetError("tokenizer daemon closed the connection without a result")
+    return response
+
+
+def remove_socket(path: str) -> None:
+    """Unlink a socket whose daemon stopped answering, if it is still there."""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def connect(path: str) -> Optional[socket.socket]:
+    """Connect to the daemon socket at path, or return None when nothing listens there."""
+    try:
+        socket_stat = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISSOCK(socket_stat.st_mode) or socket_stat.st_uid != os.getuid():
+        raise CountError(f"refusing tokenizer daemon socket {path}: not owned by this user")
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(path)
+    except OSError:
+        connection.close()
+        return None
+    return connection
+
+
+def spawn_server(path: str, build_counter: Callable[[], Counter]) -> None:
+    """Fork a detached server and block until it is listening on path.
+
+    Until the server is ready its stderr stays attached to ours so load
+    failures (missing dependencies, download errors) still reach the caller.
+    """
+    ready_reader, ready_writer = os.pipe()
+    if os.fork() != 0:
+        os.close(ready_writer)
+        with os.fdopen(ready_reader, "rb") as ready_stream:
+            marker = ready_stream.read()
+        if marker != READY_MARKER:
+            sys.exit(1)
+        return
+
+    os.close(ready_reader)
+    os.setsid()
+    null_fd = os.open(os.devnull, os.O_RDWR)
+    os.dup2(null_fd, 0)
+    os.dup2(null_fd, 1)
+    try:
+        counter = build_counter()
+        listener = listen(path)
+    except SystemExit:
+        os._exit(1)
+    except BaseException as start_error:
+        sys.stderr.write(f"tokenizer daemon failed to start: {start_error}\n")
+        sys.stderr.flush()
+        os._exit(1)
+    os.write(ready_writer, READY_MARKER)
+    os.close(ready_writer)
+    os.dup2(null_fd, 2)
+    os.close(null_fd)
+    try:
+        serve(listener, path, counter)
+    finally:
+        os._exit(0)
+
+
+def listen(path: str) -> socket.socket:
+    """Bind a fresh socket and atomically move it into place.
+
+    Renaming over path replaces a stale socket left by a crashed daemon and
+    keeps concurrent spawns from failing with EADDRINUSE.
+    """
+    staging_path = f"{path}.{os.getpid()}"
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(staging_path)
+    os.chmod(staging_path, 0o600)
+    listener.listen()
+    os.rename(staging_path, path)
+    return listener
+
+
+def serve(listener: socket.socket, path: str, counter: Counter) -> None:
+    """Answer count requests until idle or asked to shut down, then remove the socket."""
+    socket_inode = os.stat(path).st_ino
+    with listener:
+        while True:
+            readable, _, _ = select.select([listener], [], [], IDLE_TIMEOUT_SECONDS)
+            if not readable:
+                break
+            connection, _ = listener.accept()
+            with connection:
+                try:
+                    keep_serving = handle_connection(connection, counter)
+                except OSError:
+                    continue
+            if not keep_serving:
+                break
+
+    try:
+        if os.stat(path).st_ino == socket_inode:
+            os.unlink(path)
+    except OSError:
+        pass
+
+
+def handle_connection(connection: socket.socket, counter: Counter) -> bool:
+    """Count one request frame; an empty frame asks the daemon to exit.
+
+    Helpers never send empty payloads, since they answer 0 without the
+    daemon, so the empty frame is free to act as the shutdown request.
+    """
+    payload = receive_frame(connection)
+    if payload is None:
+        return True
+    if not payload:
+        return False
+    try:
+        response = STATUS_OK + str(counter(payload)).encode("ascii")
+    except Exception as count_error:
+        response = STATUS_ERROR + str(count_error).encode("utf-8")
+    send_frame(connection, response)
+    return True
+
+
+def send_frame(connection: socket.socket, data: Union[bytes, StdinPayload]) -> None:
+    """Send data preceded by its length as an unsigned 64-bit big-endian header."""
+    connection.sendall(FRAME_HEADER.pack(len(data)))
+    connection.sendall(data)
+
+
+def receive_frame(connection: socket.socket) -> Optional[bytes]:
+    """Receive one length-prefixed frame, or None if the peer closed first."""
+    header = receive_exactly(connection, FRAME_HEADER.size)
+    if header is None:
+        return None
+    (length,) = FRAME_HEADER.unpack(header)
+    return receive_exactly(connection, length)
+
+
+def receive_exactly(connection: socket.socket, length: int) -> Optional[bytes]:
+    """Receive exactly length bytes, or None if the peer closed first."""
+    buffer = bytearray(length)
+    view = memoryview(buffer)
+    received = 0
+    while received < length:
+        read = connection.recv_into(view[received:])
+        if read == 0:
+            return None
+        received += read
+    return bytes(buffer)
@@ -1,39 +1,77 @@
-#!/usr/bin/env -S uv run -qq
+#!/usr/bin/env -S uv run -qq --compile-bytecode
 # /// script
 # requires-python = ">=3.11"
 # dependencies = [
-#   "sentencepiece>=0",
+#   "sentencepiece>=0.1.97",
 #   "huggingface-hub>=0"
 # ]
 # ///
 
+from concurrent.futures import ThreadPoolExecutor
+import importlib
 from pathlib import Path
+import os
 import sys
+from types import ModuleType
+from typing import Any, Callable, List
 
-try:
-    import sentencepiece as spm  # type: ignore
-    from huggingface_hub import hf_hub_download  # type: ignore
-except Exception as import_error:  # pragma: no cover - network dependent
-    sys.stderr.write(
-        f"uv runtime missing dependency for llama helper: {import_error}\n"
-    )
-    sys.stderr.write(
-        "install with: uv pip install sentencepiece huggingface-hub\n"
-    )
-    sys.exit(1)
+import helper_runtime
 
 DEFAULT_REPO = "hf-internal-testing/llama-tokenizer"
 DEFAULT_FILE = "tokenizer.model"
-DEFAULT_CACHE = Path.home() / ".cache" / "ctx" / "llama-tokenizer"
+CACHE_SUBDIRECTORY = "llama-tokenizer"
+SKIP_HF_CHECK_ENV = "CTX_SPM_SKIP_HF_CHECK"
+BATCH_BYTES = 64 * 1024
+ENCODE_GROUP_BATCHES = 16
+USAGE = """usage: llama_count.py [-h] [--model MODEL] [--daemon]
+
+Count tokens with the Llama SentencePiece tokenizer.
+
+options:
+  -h, --help     show this help message and exit
+  --model MODEL  Llama model name requested by ctx; all Llama models share one tokenizer.
+  --daemon       Count through a background process that keeps the tokenizer loaded between calls (Unix only).
+"""
+
+
+def import_dependency(module_name: str) -> ModuleType:
+    """Import a helper dependency, exiting with install guidance when it is missing."""
+    try:
+        return importlib.import_module(module_name)
+    except Exception as import_error:  # pragma: no cover - network dependent
+        sys.stderr.write(
+            f"uv runtime missing dependency for llama helper: {import_error}\n"
+        )
+        sys.stderr.write(
+            "install with: uv pip install sentencepiece huggingface-hub\n"
+        )
+        sys.exit(1)
 
 
 def resolve_model_path() -> Path:
-    DEFAULT_CACHE.mkdir(parents=True, exist_ok=True)
+    """Return the cached tokenizer model, downloading it only on a cache miss.
+
+    hf_hub_download revalidates against the Hub on every call, so a present,
+    non-empty model file is trusted as-is. CTX_SPM_SKIP_HF_CHECK=1 forbids
+    the download entirely.
+    """
+    model_cache = helper_runtime.cache_dir() / CACHE_SUBDIRECTORY
+    cached_model = model_cache / DEFAULT_FILE
+    if cached_model.is_file() and cached_model.stat().st_size > 0:
+        return cached_model
+    if os.getenv(SKIP_HF_CHECK_ENV) == "1":
+        sys.stderr.write(
+            f"{SKIP_HF_CHECK_ENV}=1 is set but {cached_model} is missing\n"
+        )
+        sys.exit(1)
+
+    hf_hub = import_dependency("huggingface_hub")
+    model_cache.mkdir(parents=True, exist_ok=True)
     try:
-        downloaded = hf_hub_download(
+        downloaded = hf_hub.hf_hub_download(
             repo_id=DEFAULT_REPO,
             filename=DEFAULT_FILE,
-            local_dir=str(DEFAULT_CACHE),
+            local_dir=str(model_cache),
         )
         return Path(downloaded)
     except Exception as download_error:  # pragma: no cover
@@ -41,19 +79,105 @@ def resolve_model_path() -> Path:
             f"failed to download SentencePiece model automatically: {download_error}\n"
         )
         sys.stderr.write(
-            "install sentencepiece manually or place tokenizer.model at ~/.cache/ctx/llama-tokenizer\n"
+            f"install sentencepiece manually or place {DEFAULT_FILE} at {model_cache}\n"
         )
         sys.exit(1)
 
 
-def main() -> None:
-    model_path = resolve_model_path()
+def load_processor(model_path: Path) -> Any:
+    """Load the model from its serialized ModelProto in a single read.
+
+    tokenizer.model already is the binary ModelProto, so no sidecar cache is
+    needed; reading it ourselves skips the file handling inside Load.
+    """
+    spm = import_dependency("sentencepiece")
     processor = spm.SentencePieceProcessor()
-    processor.Load(str(model_path))
+    processor.LoadFromSerializedProto(model_path.read_bytes())
+    return processor
+
+
+def split_batches(payload: bytes) -> List[bytes]:
+    """Group whole lines into batches of roughly BATCH_BYTES each.
+
+    SentencePiece encodes each batch independently, so the count may drift by
+    at most one token per batch boundary; acceptable for a count-only helper.
+    Batches never straddle the blocks iter_stdin_blocks streams, so a payload
+    counted whole by the daemon splits exactly like the streamed one and both
+    report the same count. Batches stay as UTF-8 bytes, which SentencePiece
+    accepts without decoding.
+    """
+    return [
+        batch
+        for block in helper_runtime.iter_line_blocks(payload, helper_runtime.STDIN_READ_BYTES)
+        for batch in helper_runtime.iter_line_blocks(block, BATCH_BYTES)
+    ]
+
+
+def build_counter() -> Callable[[bytes], int]:
+    """Load the tokenizer, resolving the model while sentencepiece imports.
+
+    Model resolution (a Hub download on first use) runs on a worker thread,
+    so its I/O overlaps the import of the native extension.
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        model_path = executor.submit(resolve_model_path)
+        import_dependency("sentencepiece")
+        processor = load_processor(model_path.result())
+    return lambda payload: count_tokens(processor, payload)
+
+
+def count_tokens(processor: Any, payload: bytes) -> int:
+    """Sum token counts, encoding ENCODE_GROUP_BATCHES batches per call.
+
+    num_threads lets SentencePiece encode a group's batches on native threads
+    outside the GIL, capped at the group size and the CPU count. Groups only
+    hold several batches because iter_stdin_blocks fills whole blocks even
+    from pipes. Only the count is needed, so each group's id lists are
+    dropped before the next group is encoded instead of holding ids for the
+    whole input at once.
+    """
+    batches = split_batches(payload)
+    token_count = 0
+    for start in range(0, len(batches), ENCODE_GROUP_BATCHES):
+        group = batches[start:start + ENCODE_GROUP_BATCHES]
+        token_id_batches = processor.encode(
+            group,
+            out_type=int,
+            num_threads=min(len(group), os.cpu_count() or 1),
+        )
+        token_count += sum(map(len, token_id_batches))
+    return token_count
+
+
+def count_stdin_stream() -> int:
+    """Count stdin block by block, loading the tokenizer only once input arrives."""
+    blocks = helper_runtime.iter_stdin_blocks()
+    first_block = next(blocks, None)
+    if first_block is None:
+        return 0
+    counter = build_counter()
+    return counter(first_block) + sum(counter(block) for block in blocks)
+
+
+def count_stdin_via_daemon() -> int:
+    """Count all of stdin through the tokenizer daemon, starting it when needed."""
+    payload = helper_runtime.read_stdin_bytes()
+    if not payload:
+        return 0
+    try:
+        socket_path = helper_runtime.socket_path("llama", Path(__file__), "")
+        return helper_runtime.count_via_daemon(socket_path, payload, build_counter)
+    except helper_runtime.CountError as count_error:
+        sys.stderr.write(f"{count_error}\n")
+        sys.exit(1)
+
+
+def main() -> None:
+    parsed_args = helper_runtime.parse_arguments(USAGE, {"model": None}, ("daemon",))
 
-    input_text = sys.stdin.read()
-    token_ids = processor.EncodeAsIds(input_text)
-    sys.stdout.write(f"{len(token_ids)}\n")
+    use_daemon = parsed_args["daemon"] and helper_runtime.DAEMON_SUPPORTED
+    token_count = count_stdin_via_daemon() if use_daemon else count_stdin_stream()
+    helper_runtime.write_counts([token_count])
 
 
 if __name__ == "__main__":
@@ -3,11 +3,25 @@
 package tokenizer
 
 import (
+	"io"
+	"net"
 	"os"
 	"os/exec"
+	"path/filepath"
+	"runtime"
 	"testing"
+	"time"
 )
 
+const (
+	helperDaemonNetwork       = "unix"
+	helperDaemonSocketPattern = "*.sock"
+	helperDaemonSubdirectory  = "ctx"
+	helperDaemonStopTimeout   = 5 * time.Second
+)
+
+var helperDaemonShutdownFrame = make([]byte, 8)
+
 func requireHelperExecution(t *testing.T) {
 	if os.Getenv("CTX_TEST_RUN_HELPERS") != "1" {
 		t.Skip("set CTX_TEST_RUN_HELPERS=1 to run uv helper integration tests")
@@ -67,3 +81,75 @@ func TestPythonHelperLlama(t *testing.T) {
 		t.Fatalf("expected sentencepiece helper token output > 0, got %d", tokens)
 	}
 }
+
+func TestPythonHelperLlamaDaemon(t *testing.T) {
+	requireHelperExecution(t)
+	if runtime.GOOS == windowsGOOS {
+		t.Skip("the helper daemon is Unix-only")
+	}
+	uv := uvExecutable(t)
+	t.Setenv("CTX_UV", uv)
+	runtimeDir := t.TempDir()
+	t.Setenv("XDG_RUNTIME_DIR", runtimeDir)
+	t.Cleanup(func() { stopHelperDaemons(t, runtimeDir) })
+	const input = "sentencepiece daemon integration test\nwith a second line"
+
+	t.Setenv(helperDaemonEnv, "")
+	directCounter, _, err := NewCounter(Config{Model: "llama-3.1-8b"})
+	if err != nil {
+		t.Fatalf("NewCounter error: %v", err)
+	}
+	expectedTokens, err := directCounter.CountString(input)
+	if err != nil {
+		t.Fatalf("direct CountString error: %v", err)
+	}
+	if expectedTokens <= 0 {
+		t.Fatalf("expected sentencepiece helper token output > 0, got %d", expectedTokens)
+	}
+
+	t.Setenv(helperDaemonEnv, helperDaemonEnabled)
+	daemonCounter, _, err := NewCounter(Config{Model: "llama-3.1-8b"})
+	if err != nil {
+		t.Fatalf("NewCounter error: %v", err)
+	}
+	for _, attempt := range []string{"spawning", "reusing"} {
+		tokens, err := daemonCounter.CountString(input)
+		if err != nil {
+			t.Fatalf("daemon CountString error while %s the daemon: %v", attempt, err)
+		}
+		if tokens != expectedTokens {
+			t.Fatalf("daemon count while %s the daemon = %d, want %d", attempt, tokens, expectedTokens)
+		}
+	}
+}
+
+func stopHelperDaemons(t *testing.T, runtimeDir string) {
+	t.Helper()
+	socketPaths, err := filepath.Glob(filepath.Join(runtimeDir, helperDaemonSubdirectory, helperDaemonSocketPattern))
+	if err != nil {
+		t.Fatalf("list helper daemon sockets: %v", err)
+	}
+	for _, socketPath := range socketPaths {
+		connection, dialErr := net.Dial(helperDaemonNetwork, socketPath)
+		if dialErr != nil {
+			t.Errorf("connect to helper daemon %s: %v", socketPath, dialErr)
+			continue
+		}
+		if _, writeErr := connection.Write(helperDaemonShutdownFrame); writeErr != nil {
+			t.Errorf("send shutdown to helper daemon %s: %v", socketPath, writeErr)
+		}
+		_, _ = io.Copy(io.Discard, connection)
+		_ = connection.Close()
+		deadline := time.Now().Add(helperDaemonStopTimeout)
+		for {
+			if _, statErr := os.Stat(socketPath); os.IsNotExist(statErr) {
+				break
+			}
+			if time.Now().After(deadline) {
+				t.Errorf("helper daemon %s did not exit within %s", socketPath, helperDaemonStopTimeout)
+				break
+			}
+			time.Sleep(10 * time.Millisecond)
+		}
+	}
+}
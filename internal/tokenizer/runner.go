@@ -3,12 +3,18 @@ package tokenizer
 import (
 	"context"
 	"fmt"
+	"os"
 	"os/exec"
 	"strconv"
 	"strings"
 	"time"
 )
 
+const (
+	uvCompileBytecodeVariable = "UV_COMPILE_BYTECODE"
+	uvCompileBytecodeEnabled  = "1"
+)
+
 type scriptCounter struct {
 	runner     string
 	scriptPath string
@@ -33,6 +39,7 @@ func (counter scriptCounter) CountString(input string) (int, error) {
 	commandArgs := append([]string{"run", counter.scriptPath}, counter.args...)
 	command := exec.CommandContext(ctx, runner, commandArgs...)
 	command.Stdin = strings.NewReader(input)
+	command.Env = helperEnvironment()
 
 	outputBytes, err := command.CombinedOutput()
 	cleanOutput := sanitizeHelperOutput(string(outputBytes))
@@ -53,6 +60,14 @@ func (counter scriptCounter) CountString(input string) (int, error) {
 	return tokenCount, nil
 }
 
+func helperEnvironment() []string {
+	environment := os.Environ()
+	if _, configured := os.LookupEnv(uvCompileBytecodeVariable); !configured {
+		environment = append(environment, uvCompileBytecodeVariable+"="+uvCompileBytecodeEnabled)
+	}
+	return environment
+}
+
 func parseHelperTokenOutput(rawOutput string) (int, error) {
 	trimmed := strings.TrimSpace(rawOutput)
 	if trimmed == "" {
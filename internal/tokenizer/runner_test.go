@@ -1,6 +1,9 @@
 package tokenizer
 
-import "testing"
+import (
+	"os"
+	"testing"
+)
 
 func TestParseHelperTokenOutputLastLineInteger(t *testing.T) {
 	count, err := parseHelperTokenOutput("123\n")
@@ -66,3 +69,22 @@ func TestSanitizeHelperOutputReturnsEmptyWhenOnlyNoise(t *testing.T) {
 		t.Fatalf("expected empty sanitized output, got %q", result)
 	}
 }
+
+func TestHelperEnvironmentEnablesBytecodeCompilation(t *testing.T) {
+	t.Setenv(uvCompileBytecodeVariable, "")
+	os.Unsetenv(uvCompileBytecodeVariable)
+	environment := helperEnvironment()
+	expected := uvCompileBytecodeVariable + "=" + uvCompileBytecodeEnabled
+	if environment[len(environment)-1] != expected {
+		t.Fatalf("expected %q to be appended, got %v", expected, environment)
+	}
+}
+
+func TestHelperEnvironmentKeepsExplicitBytecodeSetting(t *testing.T) {
+	t.Setenv(uvCompileBytecodeVariable, "0")
+	for _, entry := range helperEnvironment() {
+		if entry == uvCompileBytecodeVariable+"="+uvCompileBytecodeEnabled {
+			t.Fatalf("expected explicit %s=0 to be kept, got %v", uvCompileBytecodeVariable, entry)
+		}
+	}
+}
@@ -6,6 +6,7 @@ import (
 	"os"
 	"os/exec"
 	"path/filepath"
+	"runtime"
 	"strings"
 	"time"
 
@@ -39,6 +40,10 @@ const (
 	defaultModel        = "gpt-4o"
 	defaultEncodingName = "cl100k_base"
 	defaultUVTimeout    = 120 * time.Second
+	helperDaemonEnv     = "CTX_TOKENIZER_DAEMON"
+	helperDaemonFlag    = "--daemon"
+	helperDaemonEnabled = "1"
+	windowsGOOS         = "windows"
 )
 
 var ErrHelperUnavailable = errors.New("tokenizer helper unavailable")
@@ -90,7 +95,7 @@ func NewCounter(cfg Config) (Counter, string, error) {
 		return scriptCounter{
 			runner:     uvExecutable,
 			scriptPath: scriptPath,
-			args:       []string{"--model", model},
+			args:       helperArgs(model),
 			helperName: "anthropic_tokenizer",
 			timeout:    timeout,
 		}, model, nil
@@ -107,7 +112,7 @@ func NewCounter(cfg Config) (Counter, string, error) {
 		return scriptCounter{
 			runner:     uvExecutable,
 			scriptPath: scriptPath,
-			args:       []string{"--model", model},
+			args:       helperArgs(model),
 			helperName: "sentencepiece",
 			timeout:    timeout,
 		}, model, nil
@@ -304,6 +309,14 @@ func isOpenAIModel(model string) bool {
 	return false
 }
 
+func helperArgs(model string) []string {
+	args := []string{"--model", model}
+	if runtime.GOOS != windowsGOOS && strings.TrimSpace(os.Getenv(helperDaemonEnv)) == helperDaemonEnabled {
+		args = append(args, helperDaemonFlag)
+	}
+	return args
+}
+
 func detectUVExecutable() (string, error) {
 	if explicit := strings.TrimSpace(os.Getenv("CTX_UV")); explicit != "" {
 		if path, err := exec.LookPath(explicit); err == nil {
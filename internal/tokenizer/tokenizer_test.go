@@ -5,6 +5,7 @@ import (
 	"os"
 	"path/filepath"
 	"reflect"
+	"runtime"
 	"strings"
 	"testing"
 )
@@ -137,3 +138,30 @@ func TestNewCounterAnthropicAlias(t *testing.T) {
 		t.Fatalf("unexpected helper args: %v", script.args)
 	}
 }
+
+func TestNewCounterLlamaDaemonArgs(t *testing.T) {
+	executablePath, execErr := os.Executable()
+	if execErr != nil {
+		t.Fatalf("resolve current executable: %v", execErr)
+	}
+	t.Setenv("CTX_UV", executablePath)
+	t.Setenv(helperDaemonEnv, helperDaemonEnabled)
+	counter, _, err := NewCounter(Config{Model: "llama-3.1-8b"})
+	if err != nil {
+		t.Fatalf("NewCounter error: %v", err)
+	}
+	script, ok := counter.(scriptCounter)
+	if !ok {
+		t.Fatalf("expected scriptCounter, got %T", counter)
+	}
+	expectedArgs := []string{"--model", "llama-3.1-8b"}
+	if runtime.GOOS != windowsGOOS {
+		expectedArgs = append(expectedArgs, helperDaemonFlag)
+	}
+	if !reflect.DeepEqual(script.args, expectedArgs) {
+		t.Fatalf("unexpected helper args: %v", script.args)
+	}
+	if _, statErr := os.Stat(filepath.Join(filepath.Dir(script.scriptPath), runtimeModuleName)); statErr != nil {
+		t.Fatalf("expected helper runtime next to helper script: %v", statErr)
+	}
+}